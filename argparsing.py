@@ -1,23 +1,30 @@
 #!/usr/bin/env python3
 import argparse
+import warnings
 
 __version__ = "0.1.0"
 
 def parse_args(argv):
-    """Legacy simple parser helper (keeps older behavior)."""
+    """Legacy simple parser helper (keeps older behavior).
+
+    Deprecated: the CLI is parsed by build_parser(); this is kept only for
+    callers of the old positional layout.
+    """
+    warnings.warn("parse_args() is deprecated; use build_parser()", DeprecationWarning, stacklevel=2)
     if len(argv) < 3:
         print("Usage: vcard.py CategoryA CategoryB file1.vcf [file2.vcf ...] [--out out.vcf]")
         raise SystemExit(2)
 
     args = list(argv)
     out_path = None
-    if "--out" in args:
-        i = args.index("--out")
-        if i == len(args) - 1:
-            print("Provide output filename after --out")
-            raise SystemExit(2)
-        out_path = args[i+1]
-        args = args[:i] + args[i+2:]
+    for i, arg in enumerate(args):
+        if arg == "--out":
+            if i == len(args) - 1:
+                print("Provide output filename after --out")
+                raise SystemExit(2)
+            out_path = args[i+1]
+            args = args[:i] + args[i+2:]
+            break
 
     cat_a = args[0].lower()
     cat_b = args[1].lower()
@@ -40,10 +47,16 @@ def build_parser():
     p_contacts.add_argument("--searchname", action="append", dest="searchname", default=[], help="Filter contacts whose name contains these fragments (repeat or comma-separate)")
     p_contacts.add_argument("--namefile", dest="namefile", help="Text file with one contact name per line (exact match)")
     p_contacts.add_argument("--out", "-o", dest="out", help="Write matches to file (default stdout)")
+    p_contacts.add_argument("--cache", dest="cache", action="store_true",
+                            help="Reuse parsed vCards cached under $XDG_CACHE_HOME/vcard.py while the files are unchanged")
 
     p_counts = subparsers.add_parser("count-categories", help="Compute/print category occurrence counts")
     p_counts.add_argument("files", nargs="*", help="Optional .vcf files to compute counts from")
     p_counts.add_argument("--out", "-o", dest="out", help="Write counts to file (default stdout)")
+    p_counts.add_argument("--sort", dest="sort_by", choices=["name", "count"], default="name",
+                          help="Order categories by name (default) or by descending count")
+    p_counts.add_argument("--cache", dest="cache", action="store_true",
+                          help="Reuse parsed vCards cached under $XDG_CACHE_HOME/vcard.py while the files are unchanged")
 
     p_delete = subparsers.add_parser("delete-contacts", help="Delete vCards whose names appear in a file or args")
     p_delete.add_argument("vcf_file", help="Input .vcf file to update")
@@ -10,6 +10,7 @@ How to run:
 """
 
 import importlib.util
+import pickle
 from pathlib import Path
 import sys
 
@@ -23,6 +24,13 @@ def load_module():
     spec.loader.exec_module(mod)
     return mod
 
+def load_utils():
+    fp = Path("./utils.py")
+    spec = importlib.util.spec_from_file_location("utils", str(fp))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
 def test_read_vcards_and_get_categories(tmp_path):
     mod = load_module()
     # create a single file containing two vCards (one CRLF, one LF)
@@ -112,3 +120,211 @@ def test_main_writes_output(tmp_path):
     assert "FN:Bob" in content
     # the implementation appends a trailing newline when writing matches
     assert content.endswith("\n")
+
+def test_field_getters():
+    mod = load_utils()
+    card = "\n".join([
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        "N:Doe;John;;;",
+        "FN:",
+        "TEL;TYPE=CELL:+49 151 000",
+        "tel:",
+        "TEL:123",
+        "categories:Friends; Work,VIP",
+        "END:VCARD",
+    ])
+    # an empty FN line falls through to the N property
+    assert mod.get_name(card) == "John Doe"
+    assert mod.get_numbers(card) == ["+49 151 000", "123"]
+    assert mod.get_categories(card) == ["Friends", "Work", "VIP"]
+
+def test_iter_records_matches_getters():
+    mod = load_utils()
+    text = "\n".join([
+        "BEGIN:VCARD",
+        "FN:Alice",
+        "TEL:111",
+        "CATEGORIES:Friends,Work",
+        "END:VCARD",
+        "BEGIN:VCARD",
+        "N:Smith;Bob",
+        "END:VCARD",
+    ]) + "\n"
+    records = list(mod.iter_records(text))
+    cards = list(mod.iter_vcards(text))
+    assert [r.text for r in records] == cards
+    for record, card in zip(records, cards):
+        assert record.name == mod.get_name(card)
+        assert record.numbers == mod.get_numbers(card)
+        assert record.categories == mod.get_categories(card)
+    assert all(r.text is None for r in mod.iter_records(text, keep_text=False))
+
+def test_read_file_as_utf8_encodings(tmp_path):
+    mod = load_utils()
+    text = "BEGIN:VCARD\r\nFN:Jörg €\r\nEND:VCARD\r\n"
+    expected = "BEGIN:VCARD\nFN:Jörg €\nEND:VCARD\n"
+    for enc in ("utf-8", "utf-8-sig", "utf-16", "cp1252"):
+        f = tmp_path / f"{enc}.vcf"
+        f.write_bytes(text.encode(enc))
+        assert mod.read_file_as_utf8(f) == expected
+
+def test_read_records_cache(tmp_path, monkeypatch):
+    mod = load_utils()
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    f = tmp_path / "a.vcf"
+    f.write_text("BEGIN:VCARD\nFN:Alice\nEND:VCARD\n", encoding="utf-8")
+
+    first = mod.read_records([str(f)], cache=True)
+    assert [r.name for r in first] == ["Alice"]
+    assert list((tmp_path / "cache" / "vcard.py").glob("*.pickle"))
+    assert mod.read_records([str(f)], cache=True) == first
+
+    # a changed file (different size) invalidates the cached entry
+    f.write_text("BEGIN:VCARD\nFN:Bob Builder\nEND:VCARD\n", encoding="utf-8")
+    assert [r.name for r in mod.read_records([str(f)], cache=True)] == ["Bob Builder"]
+
+    # so does a cache written in another format, even for an unchanged file
+    (cache_file,) = (tmp_path / "cache" / "vcard.py").glob("*.pickle")
+    st = f.resolve().stat()
+    with cache_file.open("wb") as fh:
+        old_key = (str(f.resolve()), st.st_mtime_ns, st.st_size)
+        pickle.dump((old_key, [(None, "stale", [], [], frozenset())]), fh)
+    assert [r.name for r in mod.read_records([str(f)], cache=True)] == ["Bob Builder"]
+
+def test_iter_vcards_stream_matches_iter_vcards():
+    import io
+    mod = load_utils()
+    text = "\n".join([
+        "BEGIN:VCARD",
+        "FN:Alice",
+        "NOTE:folded",
+        " across lines",
+        "END:VCARD",
+        "junk between cards",
+        "begin:vcard",
+        "FN:Bob",
+        "end:vcard",
+    ]) + "\n"
+    expected = list(mod.iter_vcards(text))
+    assert len(expected) == 2
+    for chunk_size in (1, 5, 64, 1 << 20):
+        assert list(mod.iter_vcards_stream(io.StringIO(text), chunk_size)) == expected
+
+@pytest.mark.skipif(not Path("/dev/fd").is_dir(), reason="needs /dev/fd")
+def test_pipe_inputs_are_read_in_full():
+    import os
+    mod = load_utils()
+    data = "".join(f"BEGIN:VCARD\nFN:Person {i}\nEND:VCARD\n" for i in range(500)).encode("utf-8")
+
+    def read_from_pipe(func):
+        # a pipe has no size and cannot be re-opened or rewound
+        r, w = os.pipe()
+        os.write(w, data)
+        os.close(w)
+        try:
+            return func(f"/dev/fd/{r}")
+        finally:
+            os.close(r)
+
+    assert len(read_from_pipe(lambda p: mod.read_vcards([p]))) == 500
+    records = read_from_pipe(lambda p: mod.read_records([p]))
+    assert [r.name for r in records] == [f"Person {i}" for i in range(500)]
+
+def test_categorycontact_records_match_categorycontacts(tmp_path):
+    mod = load_utils()
+    f = tmp_path / "a.vcf"
+    f.write_text("\n".join([
+        "BEGIN:VCARD",
+        "FN:Alice",
+        "TEL:111",
+        "CATEGORIES:Friends,Work",
+        "END:VCARD",
+        "BEGIN:VCARD",
+        "FN:Bob",
+        "CATEGORIES:Work",
+        "END:VCARD",
+    ]) + "\n", encoding="utf-8")
+    for kwargs in ({}, {"must_have": "work"}, {"exclude": "friends"}):
+        cards = mod.categorycontacts(files=[str(f)], **kwargs)
+        records = mod.categorycontact_records(files=[str(f)], **kwargs)
+        assert [r.text for r in records] == cards
+        assert [r.name for r in records] == [mod.get_name(c) for c in cards]
+    (bob,) = mod.categorycontact_records(files=[str(f)], exclude="friends;vip")
+    assert bob.name == "Bob" and bob.categories == ["Work"] and bob.numbers == []
+
+def test_categories_from_vcard_keeps_its_own_rules():
+    mod = load_utils()
+    card = "\n".join([
+        "BEGIN:VCARD",
+        "FN:Alice",
+        "CATEGORY:Ignored",
+        "categories: Friends, Work;VIP ,",
+        "CATEGORIES:Second",
+        "END:VCARD",
+    ])
+    # unlike get_categories: CATEGORIES: only, split on ',' alone, and
+    # the first such line wins
+    assert mod.categories_from_vcard(card) == {"friends", "work;vip"}
+    assert mod.categories_from_vcard("BEGIN:VCARD\nCATEGORY:a\nEND:VCARD") == set()
+    assert mod.categories_from_vcard("BEGIN:VCARD\nFN:Bob\nEND:VCARD") == set()
+
+def test_count_categories_sort(tmp_path):
+    import io
+    mod = load_utils()
+    f = tmp_path / "a.vcf"
+    f.write_text("".join(
+        f"BEGIN:VCARD\nFN:P{i}\nCATEGORIES:{cats}\nEND:VCARD\n"
+        for i, cats in enumerate(["Work,Club", "work", "Work,Friends", "friends"])
+    ), encoding="utf-8")
+
+    out = io.StringIO()
+    counts = mod.count_categories([str(f)], output=out)
+    assert counts == {"work": 3, "friends": 2, "club": 1}
+    # the default stays alphabetical
+    assert out.getvalue() == "Category counts:\n  club: 1\n  friends: 2\n  work: 3\n"
+
+    out = io.StringIO()
+    mod.count_categories([str(f)], output=out, sort_by="count")
+    assert out.getvalue() == "Category counts:\n  work: 3\n  friends: 2\n  club: 1\n"
+
+    # and through the CLI
+    out_file = tmp_path / "counts.txt"
+    load_module().main(["count-categories", str(f), "--sort", "count", "--out", str(out_file)])
+    assert out_file.read_text(encoding="utf-8").splitlines()[1:] == ["  work: 3", "  friends: 2", "  club: 1"]
+
+def test_strip_card_fields_keep(tmp_path):
+    mod = load_utils()
+    card = "\n".join([
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        "N:Doe;John;;;",
+        "FN:John Doe",
+        "N;CHARSET=UTF-8:Doe;John",
+        "TEL;TYPE=CELL:+49 151",
+        "tel:123",
+        "TELEX:999",
+        "PHOTO;ENCODING=b;TYPE=JPEG:QUJD",
+        "CATEGORIES:Friends",
+        "CATEGORIES;X=1:Ignored",
+        "EMAIL:john@example.org",
+        "end:vcard",
+    ])
+    always = ["BEGIN:VCARD", "VERSION:3.0", "N:Doe;John;;;", "FN:John Doe", "end:vcard"]
+
+    def kept(keep):
+        return mod._strip_card_fields(card, keep).splitlines()
+
+    # names, version and the card markers are always kept; parameters are
+    # only allowed on TEL and PHOTO
+    assert kept([]) == always
+    assert kept(["number"]) == always[:4] + ["TEL;TYPE=CELL:+49 151", "tel:123"] + always[4:]
+    assert kept(["photo"]) == always[:4] + ["PHOTO;ENCODING=b;TYPE=JPEG:QUJD"] + always[4:]
+    assert kept([" Category "]) == always[:4] + ["CATEGORIES:Friends"] + always[4:]
+
+    # delete-contacts --keep strips matching cards and leaves the others alone
+    f = tmp_path / "a.vcf"
+    other = "BEGIN:VCARD\nFN:Jane\nEMAIL:jane@example.org\nEND:VCARD"
+    f.write_text(card + "\n" + other + "\n", encoding="utf-8")
+    assert mod.delete_vcards_by_name(str(f), names=["john doe"], keep_fields=["number"]) == 0
+    assert f.read_text(encoding="utf-8") == "\n".join(kept(["number"])) + "\n" + other + "\n"
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 import sys
 import re
+import os
+import codecs
+import io
+import hashlib
 import logging
-from typing import List
+import pickle
+import stat
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
 from pathlib import Path
 
 """function.py
@@ -11,25 +21,90 @@ All vCard utility function implementations (extracted from vcard.py).
 """
 
 __version__ = "0.1.0"
-_categorycounts = {}  # module-level store for last computed category counts
+_categorycounts = Counter()  # module-level store for last computed category counts
 
-def count_categories(files: List[str] = None, output=None):
-    """Compute (if files provided) and/or print stored category counts; return dict copy."""
+# Property patterns, compiled once and applied to a whole card with re.M.
+# ``[^\S\n]*`` keeps the leading-whitespace skip from running onto the next line.
+_CAT_RE = re.compile(r'^(?:CATEGORIES|CATEGORY):[^\S\n]*(.+)$', re.I | re.M)
+# categories_from_vcard's narrower rule: CATEGORIES: only, at the very
+# start of the line, and the value split on ',' alone.
+_CATEGORIES_ONLY_RE = re.compile(r'^CATEGORIES:(.*)$', re.I | re.M)
+_FN_RE = re.compile(r'^FN:[^\S\n]*(.+)$', re.I | re.M)
+_N_RE = re.compile(r'^N:[^\S\n]*(.+)$', re.I | re.M)
+_TEL_RE = re.compile(r'^TEL(?:;[^:\n]*)?:[^\S\n]*(.+)$', re.I | re.M)
+# All of the above as one alternation, so a card is scanned once when every
+# field is needed. Groups 1-3 flag FN, N and TEL (none set means
+# CATEGORIES/CATEGORY) and group 4 is the value, so dispatch needs no
+# upper() on the property name.
+_PROPERTY_RE = re.compile(
+    r'^(?:(FN)|(N)|CATEGORIES|CATEGORY|(TEL)(?:;[^:\n]*)?):[^\S\n]*(.+)$',
+    re.I | re.M,
+)
+# Group 1 is set for BEGIN lines, so callers never case-fold the marker.
+# _MARKER_RE only checks the first line; later lines are found by
+# _MARKER_LINE_RE, whose literal leading "\n" lets the regex engine skip
+# ahead to line breaks instead of trying the match at every character.
+_MARKER_RE = re.compile(r'^[^\S\n]*(?:(BEGIN)|END):VCARD[^\S\n]*$', re.I | re.M)
+_MARKER_LINE_RE = re.compile(r'\n[^\S\n]*(?:(BEGIN)|END):VCARD[^\S\n]*$', re.I | re.M)
+# A line break followed by one space or tab continues the previous line.
+_FOLD_RE = re.compile(r'\n[ \t]')
+# Property name (bounded: no rule name is longer) and the ':' or ';' after it.
+_PROP_NAME_RE = re.compile(r'([^:;]{0,12})([:;]?)')
+# _strip_card_fields dispatch: property name -> (--keep field that keeps it,
+# None meaning always kept; whether ;parameters may follow the name)
+_STRIP_RULES = {
+    "VERSION": (None, False),
+    "FN": (None, False),
+    "N": (None, False),
+    "TEL": ("number", True),
+    "PHOTO": ("photo", True),
+    "CATEGORIES": ("category", False),
+    "CATEGORY": ("category", False),
+}
+
+# utf-8-sig/utf-16 consume the BOM themselves
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_FALLBACK_ENCODINGS = ("utf-8", "cp1252")
+_LAST_RESORT_ENCODING = "latin-1"  # maps every byte, so it never fails
+_SNIFF_BYTES = 4096  # leading bytes checked to rule out fallback codecs early
+# Below this many bytes in total, process start-up costs more than it saves.
+_PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+_STREAM_CHUNK_SIZE = 1 << 20  # characters per read in iter_vcards_stream
+# Part of every parse-cache key; bump it whenever VCardRecord's fields change
+# so entries pickled in the old shape are re-parsed instead of misread.
+_CACHE_FORMAT = 1
+
+
+class VCardRecord(NamedTuple):
+    """Fields extracted from a single vCard; ``text`` is None unless requested.
+
+    ``category_set`` holds the lowercased categories for filtering, computed
+    once at parse time.
+    """
+    text: Optional[str]
+    name: str
+    numbers: List[str]
+    categories: List[str]
+    category_set: FrozenSet[str]
+
+
+def count_categories(files: List[str] = None, output=None, cache: bool = False, sort_by: str = "name"):
+    """Compute (if files provided) and/or print stored category counts; return dict copy.
+
+    sort_by="count" prints the most frequent categories first instead of
+    alphabetically.
+    """
     global _categorycounts
 
     # Compute counts if files given
     if files:
-        counts = {}
-        for p in files:
-            p = Path(p)
-            if not p.exists():
-                logging.warning("%s not found, skipping", p)
-                continue
-            text = read_file_as_utf8(p)
-            for vcard in iter_vcards(text):
-                cats = [c.lower() for c in get_categories(vcard)]
-                for c in cats:
-                    counts[c] = counts.get(c, 0) + 1
+        counts = Counter()
+        for file_counts in _map_files(partial(_count_one_file, cache=cache), _existing_paths(files)):
+            counts.update(file_counts)
         _categorycounts = counts
 
     # Default output
@@ -41,107 +116,384 @@ def count_categories(files: List[str] = None, output=None):
         print("No category counts available", file=output)
     else:
         print("Category counts:", file=output)
-        for k in sorted(_categorycounts):
-            print(f"  {k}: {_categorycounts[k]}", file=output)
+        if sort_by == "count":
+            items = _categorycounts.most_common()
+        else:
+            items = sorted(_categorycounts.items())
+        for k, v in items:
+            print(f"  {k}: {v}", file=output)
 
     return dict(_categorycounts)
 
+def _normalize_newlines(text: str) -> str:
+    """Convert CRLF and lone CR line endings to LF."""
+    # str.replace hands back the same object when nothing matches, so the
+    # lone-CR pass over CRLF-only text is a scan rather than a second copy.
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
 def unfold(text):
     """Unfold folded vCard lines."""
-    return text.replace('\r\n', '\n').replace('\r', '\n').replace('\n ', '').replace('\n\t', '\n')
+    # Each pass is a full copy of the text; skip the ones with nothing to do.
+    text = _normalize_newlines(text)
+    if '\n ' in text or '\n\t' in text:
+        text = _FOLD_RE.sub('', text)
+    return text
+
+def _iter_markers(text: str, pos: int = 0):
+    """Yield (is_begin, start, end) for each BEGIN/END:VCARD line of text.
+
+    pos must be the start of a line; start and end delimit the marker line.
+    """
+    if pos == 0:
+        m = _MARKER_RE.match(text)
+        if m:
+            yield m.group(1), 0, m.end()
+            pos = m.end()
+    else:
+        pos -= 1  # include the line break that precedes pos
+    for m in _MARKER_LINE_RE.finditer(text, pos):
+        yield m.group(1), m.start() + 1, m.end()
 
 def iter_vcards(text):
     """Yield individual vCard texts from a combined vCard stream."""
     text = unfold(text)
-    lines = text.splitlines()
-    card = []
-    in_card = False
-    for ln in lines:
-        up = ln.strip().upper()
-        if up == "BEGIN:VCARD":
-            in_card = True
-            card = [ln]
-        elif up == "END:VCARD":
-            if in_card:
-                card.append(ln)
-                yield "\n".join(card)
-                in_card = False
-                card = []
+    # The regex engine finds the BEGIN/END lines; Python only sees two
+    # matches per card instead of every line. A BEGIN inside an unfinished
+    # card restarts it, as the line-based splitter did.
+    start = None
+    for is_begin, begin, end in _iter_markers(text):
+        if is_begin:
+            start = begin
+        elif start is not None:
+            yield text[start:end]
+            start = None
+
+def iter_vcards_stream(fp, chunk_size: int = _STREAM_CHUNK_SIZE):
+    """Yield individual vCard texts from a text file object, read in chunks.
+
+    Gives the same cards as iter_vcards(fp.read()), but only the unfinished
+    tail of the stream is buffered, so memory stays proportional to the
+    largest card rather than the whole file.
+    """
+    raw = ""    # read, not yet unfolded
+    text = ""   # unfolded, scanned up to pos
+    pos = 0
+    start = None
+    while True:
+        chunk = fp.read(chunk_size)
+        raw += chunk
+        if chunk:
+            # A line can only be unfolded once the next line is known not to
+            # be a continuation, so stop before the last such line break.
+            i = raw.rfind("\n", 0, len(raw) - 1)
+            while i >= 0 and raw[i + 1] in " \t":
+                i = raw.rfind("\n", 0, i)
+            limit = i + 1
         else:
-            if in_card:
-                card.append(ln)
+            limit = len(raw)
+        text += unfold(raw[:limit])
+        raw = raw[limit:]
+        for is_begin, begin, end in _iter_markers(text, pos):
+            if is_begin:
+                start = begin
+            elif start is not None:
+                yield text[start:end]
+                start = None
+        if not chunk:
+            break
+        text = text[len(text) if start is None else start:]
+        pos = len(text)
+        if start is not None:
+            start = 0
+
+def parse_card(card: str, keep_text=True) -> VCardRecord:
+    """Parse one vCard block into a VCardRecord, scanning the card once."""
+    fn = None
+    n = None
+    cats = None
+    numbers = []
+    for m in _PROPERTY_RE.finditer(card):
+        is_fn, is_n, is_tel, value = m.groups()
+        if is_tel:
+            value = value.strip()
+            if value:
+                numbers.append(value)
+        elif is_fn:
+            if fn is None:
+                fn = value.strip()
+        elif is_n:
+            if n is None:
+                n = value
+        elif cats is None:
+            cats = _split_categories(value)
+    if fn is not None:
+        name = fn
+    elif n is not None:
+        name = _name_from_n(n)
+    else:
+        name = ""
+    cats = cats or []
+    return VCardRecord(
+        text=card if keep_text else None,
+        name=name,
+        numbers=numbers,
+        categories=cats,
+        category_set=_category_set(cats),
+    )
+
+def _category_set(categories: List[str]) -> FrozenSet[str]:
+    """Lowercased categories as the frozenset the category filters test."""
+    # interned: the same few labels recur on every card, so equal names
+    # share one object and set lookups hit the identity fast path
+    return frozenset(sys.intern(c.lower()) for c in categories)
+
+def iter_records(text, keep_text=True):
+    """Yield a VCardRecord per vCard in a combined vCard stream.
+
+    Name, numbers and categories are extracted in one scan per card, so
+    callers do not need to rescan the card with get_*().
+    Pass keep_text=False when the raw card text is not needed.
+    """
+    for card in iter_vcards(text):
+        yield parse_card(card, keep_text=keep_text)
 
 def categories_from_vcard(card_text):
     """Extract categories from a single vCard."""
-    cats = []
-    for ln in card_text.splitlines():
-        if ln.upper().startswith("CATEGORIES:"):
-            cats_part = ln.split(":", 1)[1]
-            cats = [c.strip().lower() for c in cats_part.split(",") if c.strip()]
-            break
-    return set(cats)
+    m = _CATEGORIES_ONLY_RE.search(card_text)
+    if not m:
+        return set()
+    return {c.strip().lower() for c in m.group(1).split(",") if c.strip()}
 
-def read_file_as_utf8(path: Path) -> str:
-    """Read bytes from path and return a str decoded to UTF-8 (best-effort)."""
-    encodings = ("utf-8", "utf-8-sig", "utf-16", "latin-1", "cp1252")
-    b = path.read_bytes()
-    for enc in encodings:
+def _detect_bom_encoding(data: bytes) -> Optional[str]:
+    """Return the codec implied by a leading byte-order mark, if any."""
+    for bom, enc in _BOM_ENCODINGS:
+        if data.startswith(bom):
+            return enc
+    return None
+
+def _plausible_encodings(head: bytes) -> Tuple[str, ...]:
+    """Return the fallback codecs that can decode the leading bytes head.
+
+    A codec that already fails on the first few KiB would fail on the whole
+    file too, so it is skipped rather than tried on (and, when streaming,
+    parsed with) the full data first. _LAST_RESORT_ENCODING is never
+    listed; it decodes anything.
+    """
+    plausible = []
+    for enc in _FALLBACK_ENCODINGS:
         try:
-            text = b.decode(enc)
-            return text.replace('\r\n', '\n').replace('\r', '\n')
-        except (UnicodeDecodeError, LookupError):
+            # final=False: head may end in the middle of a multi-byte sequence
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+        except UnicodeDecodeError:
             continue
-    return b.decode("utf-8", errors="replace").replace('\r\n', '\n').replace('\r', '\n')
+        plausible.append(enc)
+    return tuple(plausible)
 
-def read_vcards(files: List[str]) -> List[str]:
-    """Read vCard blocks from files (BEGIN:VCARD ... END:VCARD)."""
-    cards = []
+def _read_decoded(path: Path, consume):
+    """Return consume(fp) for a text stream over the decoded contents of path.
+
+    A byte-order mark selects the codec directly. Otherwise strict UTF-8 is
+    tried first, falling back to cp1252 and finally latin-1 if decoding
+    fails part-way; codecs that cannot decode the first few KiB are not
+    tried at all. After a failure consume is called again on a fresh
+    stream, so it should build its result from the stream alone. Line
+    endings are translated to "\n".
+
+    The codec is sniffed with peek() on the same handle the text is then
+    decoded from, so a pipe loses no bytes to the sniff. Trying the next
+    codec needs a rewind, so a non-seekable input without a BOM is read
+    into memory first.
+    """
+    with path.open("rb") as fh:
+        head = fh.peek(_SNIFF_BYTES)[:_SNIFF_BYTES]
+        bom_enc = _detect_bom_encoding(head)
+        if bom_enc:
+            return _consume_decoded(fh, bom_enc, "replace", consume)
+        raw = fh if fh.seekable() else io.BytesIO(fh.read())
+        for enc in _plausible_encodings(head):
+            raw.seek(0)
+            try:
+                return _consume_decoded(raw, enc, "strict", consume)
+            except UnicodeDecodeError:
+                continue
+        raw.seek(0)
+        return _consume_decoded(raw, _LAST_RESORT_ENCODING, "strict", consume)
+
+def _consume_decoded(raw, enc: str, errors: str, consume):
+    """Return consume(fp) for raw decoded as enc, leaving raw open."""
+    stream = io.TextIOWrapper(raw, encoding=enc, errors=errors)
+    try:
+        return consume(stream)
+    finally:
+        stream.detach()  # keeps raw usable for the next attempt
+
+def read_file_as_utf8(path: Path) -> str:
+    """Read path and return its text decoded to a str (best-effort); see _read_decoded()."""
+    return _read_decoded(path, lambda fp: fp.read())
+
+def _cache_file(path: Path) -> Path:
+    """Location of the parse cache for path under $XDG_CACHE_HOME/vcard.py."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()
+    return Path(base) / "vcard.py" / f"{digest}.pickle"
+
+def _cached_file_records(path: Path) -> List[VCardRecord]:
+    """Parse path, reusing the on-disk cache while (format, path, mtime, size) match."""
+    path = path.resolve()
+    st = path.stat()
+    key = (_CACHE_FORMAT, str(path), st.st_mtime_ns, st.st_size)
+    cache_file = _cache_file(path)
+    try:
+        with cache_file.open("rb") as fh:
+            cached_key, rows = pickle.load(fh)
+        if cached_key == key:
+            return [VCardRecord(*row) for row in rows]
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError) as exc:
+        logging.debug("Ignoring unreadable cache %s: %s", cache_file, exc)
+
+    records = _read_file_records(path)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # a private temp file per writer, then an atomic rename, so concurrent
+        # runs or pool workers caching the same path cannot interleave their writes
+        fd, tmp = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            # plain tuples, so the pickle does not depend on how utils was imported
+            pickle.dump((key, [tuple(r) for r in records]), fh, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError as exc:
+        logging.warning("Could not write cache %s: %s", cache_file, exc)
+    return records
+
+def _scan_file(path: Path, consume):
+    """Return consume(cards) for an iterator over the cards of path.
+
+    The text from _read_decoded is streamed through iter_vcards_stream. If
+    the codec fails part-way, consume is called again with the cards
+    decoded by the next fallback codec, so it should build its result from
+    the iterator alone.
+    """
+    return _read_decoded(path, lambda fp: consume(iter_vcards_stream(fp)))
+
+def _read_file_records(path: Path, keep_text=True) -> List[VCardRecord]:
+    """Parse every card of path into a VCardRecord."""
+    return _scan_file(path, lambda cards: [parse_card(card, keep_text) for card in cards])
+
+def _is_regular_file(path: Path) -> bool:
+    # stat the path as given: a pipe such as <(cat a.vcf) resolves to a
+    # /proc/<pid>/fd/pipe:[...] name that cannot be stat()ed again
+    return stat.S_ISREG(os.stat(path).st_mode)
+
+def _parse_one_file(path: Path, keep_text=True, cache: bool = False) -> List[VCardRecord]:
+    """Parse a single existing file into VCardRecords.
+
+    With cache=True, regular files go through the on-disk cache; pipes and
+    other special files have no stable (mtime, size) and are always read.
+    """
+    if cache and _is_regular_file(path):
+        return _cached_file_records(path)
+    return _read_file_records(path, keep_text=keep_text)
+
+def _count_cards(cards) -> Counter:
+    """Count lowercased categories over cards, extracting nothing else."""
+    counts = Counter()
+    # Counter.update counts an iterable in C (collections._count_elements)
+    counts.update(c.lower() for card in cards for c in get_categories(card))
+    return counts
+
+def _count_one_file(path: Path, cache: bool = False) -> Counter:
+    """Count lowercased categories in one file (process-pool worker).
+
+    Returning a Counter rather than records keeps the data sent back from
+    a worker proportional to the number of distinct categories.
+    """
+    if cache and _is_regular_file(path):
+        counts = Counter()
+        counts.update(c.lower() for record in _cached_file_records(path) for c in record.categories)
+        return counts
+    return _scan_file(path, _count_cards)
+
+def _existing_paths(files: List[str]) -> List[Path]:
+    paths = []
     for path in files:
         p = Path(path)
         if not p.exists():
             logging.warning("%s not found, skipping", p)
             continue
-        text = read_file_as_utf8(p)
-        for vcard in iter_vcards(text):
-            cards.append(vcard)
+        paths.append(p)
+    return paths
+
+def _map_files(func, paths: List[Path]) -> list:
+    """Apply func to each path, in worker processes when that pays off.
+
+    Several files totalling at least _PARALLEL_MIN_BYTES go to a process
+    pool (func must be picklable); anything else is processed serially.
+    Results are in the order of paths.
+    """
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers > 1 and sum(p.stat().st_size for p in paths) >= _PARALLEL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(func, paths))
+    return [func(p) for p in paths]
+
+def read_records(files: List[str], keep_text=True, cache: bool = False) -> List[VCardRecord]:
+    """Read VCardRecords from files; see parse_card().
+
+    With cache=True, parsed records are kept on disk per file and reused
+    until the file's modification time or size changes. Files are parsed
+    in this process: shipping whole records back from pool workers costs
+    more than the parse itself (see _count_one_file for the pooled path).
+    """
+    records = []
+    for path in _existing_paths(files):
+        records.extend(_parse_one_file(path, keep_text=keep_text, cache=cache))
+    return records
+
+def read_vcards(files: List[str]) -> List[str]:
+    """Read vCard blocks from files (BEGIN:VCARD ... END:VCARD)."""
+    cards = []
+    for path in _existing_paths(files):
+        cards.extend(_scan_file(path, list))
     return cards
 
 def get_categories(card: str) -> List[str]:
     """Extract categories from a vCard block. Matches CATEGORIES: or CATEGORY: (case-insensitive)."""
-    for line in card.splitlines():
-        m = re.match(r'(?i)^(?:CATEGORIES|CATEGORY):\s*(.+)$', line)
-        if m:
-            parts = m.group(1).strip()
-            items = [p.strip() for p in re.split(r'[;,]', parts) if p.strip()]
-            return items
+    m = _CAT_RE.search(card)
+    if m:
+        return _split_categories(m.group(1))
     return []
 
+def _split_semi_comma(value: str) -> List[str]:
+    """Split on ';' and ','; plain str methods beat re.split for two literal separators."""
+    return value.replace(';', ',').split(',')
+
+def _split_categories(value: str) -> List[str]:
+    return [p.strip() for p in _split_semi_comma(value) if p.strip()]
+
+def _name_from_n(value: str) -> str:
+    """Format a structured N value (family;given;...) as "given family"."""
+    parts = [p.strip() for p in value.split(';')]
+    family = parts[0] if len(parts) > 0 else ""
+    given = parts[1] if len(parts) > 1 else ""
+    return " ".join(p for p in (given, family) if p)
+
 def get_name(card: str) -> str:
     """Extract a display name from a vCard block."""
-    for line in card.splitlines():
-        m = re.match(r'(?i)^FN:\s*(.+)$', line)
-        if m:
-            return m.group(1).strip()
-    for line in card.splitlines():
-        m = re.match(r'(?i)^N:\s*(.+)$', line)
-        if m:
-            parts = [p.strip() for p in m.group(1).split(';')]
-            family = parts[0] if len(parts) > 0 else ""
-            given = parts[1] if len(parts) > 1 else ""
-            name = " ".join(p for p in (given, family) if p)
-            return name
+    m = _FN_RE.search(card)
+    if m:
+        return m.group(1).strip()
+    m = _N_RE.search(card)
+    if m:
+        return _name_from_n(m.group(1))
     return ""
 
 def get_numbers(card: str) -> List[str]:
     """Extract telephone numbers (TEL properties) from a vCard block."""
-    nums = []
-    for line in card.splitlines():
-        m = re.match(r'(?i)^TEL(?:;[^:]*)?:\s*(.+)$', line)
-        if m:
-            val = m.group(1).strip()
-            if val:
-                nums.append(val)
-    return nums
+    return [val for val in (m.group(1).strip() for m in _TEL_RE.finditer(card)) if val]
 
 def _normalize_categories(value) -> List[str]:
     if not value:
@@ -152,14 +504,33 @@ def _normalize_categories(value) -> List[str]:
         items = value
     normalized = []
     for item in items:
-        for part in re.split(r'[;,]', str(item)):
+        for part in _split_semi_comma(str(item)):
             part = part.strip().lower()
             if part:
-                normalized.append(part)
+                normalized.append(sys.intern(part))
     return normalized
 
-def categorycontacts(categories=None, files: List[str] = None, must_have=None, exclude=None) -> List[str]:
-    """Return vCard blocks matching include categories while enforcing required/excluded ones."""
+def _category_filter(include, required, exclude):
+    """Build the per-card predicate categorycontacts applies to a lowercased category set.
+
+    The query categories are frozen once and bound as default arguments,
+    so each card costs at most three C-level set operations.
+    """
+    def matches(
+        card_cats,
+        include=frozenset(include),
+        required=frozenset(required),
+        exclude=frozenset(exclude),
+    ):
+        return (
+            exclude.isdisjoint(card_cats)
+            and required.issubset(card_cats)
+            and (not include or not include.isdisjoint(card_cats))
+        )
+    return matches
+
+def _select_contacts(categories, files, must_have, exclude, cache, records):
+    """Shared body of categorycontacts and categorycontact_records."""
     include = _normalize_categories(categories)
     required = set(_normalize_categories(must_have))
     exclude = set(_normalize_categories(exclude))
@@ -167,41 +538,73 @@ def categorycontacts(categories=None, files: List[str] = None, must_have=None, e
     if files is None:
         files = []
 
+    matches = _category_filter(include, required, exclude)
+    if cache:
+        found = [
+            record
+            for record in read_records(files, cache=True)
+            if matches(record.category_set)
+        ]
+        return found if records else [record.text for record in found]
+
+    # only the categories are needed to decide (none at all without any
+    # category criteria); just the matching cards are parsed any further
+    filtering = bool(include or required or exclude)
+
+    def select(cards):
+        if filtering:
+            cards = (card for card in cards if matches(_category_set(get_categories(card))))
+        return [parse_card(card) for card in cards] if records else list(cards)
+
     results = []
-    for card in read_vcards(files):
-        card_cats = {c.lower() for c in get_categories(card)}
-        if exclude and any(cat in card_cats for cat in exclude):
-            continue
-        include_ok = True if not include else any(cat in card_cats for cat in include)
-        required_ok = all(cat in card_cats for cat in required)
-        if include_ok and required_ok:
-            results.append(card)
+    for path in _existing_paths(files):
+        results.extend(_scan_file(path, select))
     return results
 
+def categorycontacts(
+    categories=None,
+    files: List[str] = None,
+    must_have=None,
+    exclude=None,
+    cache: bool = False,
+) -> List[str]:
+    """Return vCard blocks matching include categories while enforcing required/excluded ones."""
+    return _select_contacts(categories, files, must_have, exclude, cache, records=False)
+
+def categorycontact_records(
+    categories=None,
+    files: List[str] = None,
+    must_have=None,
+    exclude=None,
+    cache: bool = False,
+) -> List[VCardRecord]:
+    """Like categorycontacts, but return a VCardRecord per matching vCard.
+
+    Callers that go on to use names, numbers or categories read them from
+    the records instead of parsing the returned cards again.
+    """
+    return _select_contacts(categories, files, must_have, exclude, cache, records=True)
+
 def _strip_card_fields(card: str, keep_fields) -> str:
     keep = {field.strip().lower() for field in (keep_fields or []) if field}
     kept_lines = []
     for line in card.splitlines():
-        stripped = line.strip()
-        upper = stripped.upper()
-        if upper == "BEGIN:VCARD" or upper == "END:VCARD":
-            kept_lines.append(line)
+        stripped = line.lstrip()
+        # Upper-case only a bounded prefix: PHOTO lines can be many
+        # kilobytes of base64.
+        if stripped[:12].upper().startswith(("BEGIN:VCARD", "END:VCARD")):
+            if stripped.rstrip().upper() in ("BEGIN:VCARD", "END:VCARD"):
+                kept_lines.append(line)
             continue
-        if upper.startswith("VERSION:"):
-            kept_lines.append(line)
+        m = _PROP_NAME_RE.match(stripped)
+        rule = _STRIP_RULES.get(m.group(1).upper())
+        if rule is None or not m.group(2):
             continue
-        if upper.startswith("FN:") or upper.startswith("N:"):
-            kept_lines.append(line)
+        field, params_ok = rule
+        if m.group(2) == ";" and not params_ok:
             continue
-        if "number" in keep and re.match(r"(?i)^TEL(?:;|:)", stripped):
+        if field is None or field in keep:
             kept_lines.append(line)
-            continue
-        if "photo" in keep and re.match(r"(?i)^PHOTO(?:;|:)", stripped):
-            kept_lines.append(line)
-            continue
-        if "category" in keep and re.match(r"(?i)^(?:CATEGORIES|CATEGORY):", stripped):
-            kept_lines.append(line)
-            continue
     return "\n".join(kept_lines)
 
 def delete_vcards_by_name(
@@ -235,39 +638,47 @@ def delete_vcards_by_name(
     if not normalized and not all_cards:
         return 0
 
-    text = read_file_as_utf8(vcf_path)
-    kept = []
-    deleted = 0
-    for card in iter_vcards(text):
+    def is_match(card: str) -> bool:
+        if all_cards:
+            return True
         card_name = get_name(card).strip().lower()
-        match = all_cards or (card_name and card_name in normalized)
-        if match:
-            if keep_fields:
-                stripped = _strip_card_fields(card, keep_fields)
-                kept.append(stripped)
-            else:
-                deleted += 1
-            continue
-        kept.append(card)
+        return bool(card_name) and card_name in normalized
+
+    cards = _scan_file(vcf_path, list)
+    if keep_fields:
+        kept = [
+            _strip_card_fields(card, keep_fields) if is_match(card) else card
+            for card in cards
+        ]
+    else:
+        kept = [card for card in cards if not is_match(card)]
+    deleted = len(cards) - len(kept)
 
     output_path = Path(out_file) if out_file else vcf_path
-    output_text = "\n".join(kept)
-    if output_text:
-        output_text += "\n"
-    output_path.write_text(output_text, encoding="utf-8")
+    # write card by card rather than joining the whole output first
+    with output_path.open("w", encoding="utf-8") as fh:
+        write = fh.write
+        for card in kept:
+            write(card)
+            write("\n")
     return deleted
 
 
 __all__ = [
     "count_categories",
     "unfold",
+    "VCardRecord",
     "iter_vcards",
+    "iter_vcards_stream",
     "categories_from_vcard",
     "read_file_as_utf8",
+    "read_records",
     "read_vcards",
     "get_categories",
     "get_name",
     "get_numbers",
+    "parse_card",
     "categorycontacts",
+    "categorycontact_records",
     "delete_vcards_by_name",
 ]
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
+import re
 import sys
 import logging
+import contextlib
 from pathlib import Path
 
 # direct imports of top-level modules (installed as py_modules or present locally)
@@ -8,12 +10,16 @@ from argparsing import build_parser
 from utils import (
     count_categories,
     categorycontacts,
-    get_name,
-    get_numbers,
-    get_categories,
+    categorycontact_records,
     delete_vcards_by_name,
 )
 
+def _open_output(path):
+    """Return a context manager yielding a text stream for path, or stdout if path is empty."""
+    if path:
+        return open(path, "w", encoding="utf-8")
+    return contextlib.nullcontext(sys.stdout)
+
 def main(argv=None):
     """Main entrypoint: parse args (via build_parser) and dispatch commands."""
     if argv is None:
@@ -25,13 +31,7 @@ def main(argv=None):
     args = parser.parse_args(argv)
 
     if args.command == "get-contacts":
-        matches = categorycontacts(
-            categories=None,
-            files=args.files,
-            must_have=args.must_have,
-            exclude=args.exclude,
-        )
-        # apply optional name filtering
+        # optional name filters
         search_terms = [
             term.strip().lower()
             for raw in (args.searchname or [])
@@ -45,71 +45,100 @@ def main(argv=None):
                 for line in Path(args.namefile).read_text(encoding="utf-8").splitlines()
                 if line.strip()
             ]
-        if namefile_terms:
-            allowed = set(namefile_terms)
-            filtered = []
-            for card in matches:
-                contact_name = get_name(card).strip().lower()
-                if contact_name and contact_name in allowed:
-                    filtered.append(card)
-            matches = filtered
+        allowed = frozenset(namefile_terms)
+        # one compiled search over an alternation of the escaped terms,
+        # instead of a Python-level any() loop over the fragments
+        find_term = None
         if search_terms:
-            filtered = []
-            for card in matches:
-                contact_name = get_name(card)
-                if contact_name and any(term in contact_name.lower() for term in search_terms):
-                    filtered.append(card)
-            matches = filtered
-
-        if args.name or args.number or args.show_categories:
-            rows = []
-            for card in matches:
-                rows.append({
-                    "name": get_name(card) if args.name else "",
-                    "number": ";".join(get_numbers(card)) if args.number else "",
-                    "category": ";".join(get_categories(card)) if args.show_categories else "",
-                })
-            columns = []
-            if args.name:
-                columns.append("name")
-            if args.number:
-                columns.append("number")
-            if args.show_categories:
-                columns.append("category")
+            find_term = re.compile("|".join(map(re.escape, search_terms))).search
+
+        columns = []
+        if args.name:
+            columns.append("name")
+        if args.number:
+            columns.append("number")
+        if args.show_categories:
+            columns.append("category")
+
+        selection = dict(
+            categories=None,
+            files=args.files,
+            must_have=args.must_have,
+            exclude=args.exclude,
+            cache=args.cache,
+        )
+        if allowed or find_term or columns:
+            # each matching card is parsed once; the filters and columns
+            # below read the record fields
+            records = categorycontact_records(**selection)
+        else:
+            records = None
+            matches = categorycontacts(**selection)
+
+        if allowed or find_term:
+            # one pass over the records; each name is lowered once
+            def name_ok(record):
+                contact_name = record.name.lower()
+                if not contact_name:
+                    return False
+                if allowed and contact_name not in allowed:
+                    return False
+                return find_term is None or find_term(contact_name) is not None
+
+            records = [record for record in records if name_ok(record)]
+        if records is not None:
+            matches = [record.text for record in records]
+
+        rows = []
+        widths = {}
+        if columns:
+            rows = [
+                {
+                    "name": record.name if args.name else "",
+                    "number": ";".join(record.numbers) if args.number else "",
+                    "category": ";".join(record.categories) if args.show_categories else "",
+                }
+                for record in records
+            ]
             widths = {
                 col: max((len(row[col]) for row in rows), default=0)
                 for col in columns[:-1]
             }
-            lines = []
-            for row in rows:
-                parts = []
-                for idx, col in enumerate(columns):
-                    val = row[col]
-                    if idx < len(columns) - 1:
-                        parts.append(val.ljust(widths.get(col, 0)))
-                    else:
-                        parts.append(val)
-                lines.append("  ".join(part for part in parts if part))
-            output = ("\n".join(lines) + ("\n" if lines else ""))
-        else:
-            output = ("\n".join(matches) + ("\n" if matches else ""))
 
         total_line = f"Total contacts: {len(matches)}\n"
-        output = output + total_line
 
-        if args.out:
-            Path(args.out).write_text(output, encoding="utf-8")
-        else:
-            sys.stdout.write(output)
+        # stream lines to the sink instead of joining the whole output first
+        with _open_output(args.out) as fh:
+            write = fh.write
+            if columns:
+                for row in rows:
+                    parts = []
+                    for idx, col in enumerate(columns):
+                        val = row[col]
+                        if idx < len(columns) - 1:
+                            parts.append(val.ljust(widths.get(col, 0)))
+                        else:
+                            parts.append(val)
+                    write("  ".join(part for part in parts if part))
+                    write("\n")
+            else:
+                for card in matches:
+                    write(card)
+                    write("\n")
+            write(total_line)
 
     elif args.command == "count-categories":
-        counts = count_categories(args.files if args.files else None)
+        counts = count_categories(
+            args.files if args.files else None,
+            cache=args.cache,
+            sort_by=args.sort_by,
+        )
         if not counts:
             logging.info("No category counts available. Provide vCard files to compute counts.")
             parser.exit(0)
         if args.out:
             with open(args.out, "w", encoding="utf-8") as fh:
-                count_categories(output=fh)
+                count_categories(output=fh, sort_by=args.sort_by)
 
     elif args.command == "delete-contacts":
         if not args.all and not args.names and not args.namefile: